@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Measure how long it takes to start the plotter in a new interpreter
+# Created: 10.19.2026
+
+# The plotter is often started as a short lived subprocess so interpreter
+# start up and imports are a large share of the cost of a run. This script
+# times a fresh interpreter importing each entry point, and reports which
+# heavy dependencies were loaded along the way.
+
+import statistics
+import subprocess
+import sys
+import time
+
+# Entry points and the modules that should be importable without loading
+# svgwrite or numpy
+entry_points = ['svg_plotter', 'utils.graph', 'utils.extract', 'utils.server']
+heavy_modules = ['numpy', 'svgwrite']
+
+# Fresh interpreters to start per entry point
+runs = 20
+
+
+def time_import(module):
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import %s' % module], check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def loaded_modules(module):
+    check = 'import sys, %s; print(" ".join(m for m in %r if m in sys.modules))' % (
+        module, heavy_modules)
+    output = subprocess.run([sys.executable, '-c', check], check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return output.split()
+
+
+############################################################
+#
+#    Main
+
+if __name__ == "__main__":
+    baseline = time_import('sys')
+    print('%-16s median %6.1f ms' % ('(interpreter)', statistics.median(baseline) * 1000))
+
+    for module in entry_points + heavy_modules:
+        timings = time_import(module)
+        heavy = [] if module in heavy_modules else loaded_modules(module)
+        print('%-16s median %6.1f ms  min %6.1f ms  heavy imports: %s' % (
+            module,
+            statistics.median(timings) * 1000,
+            min(timings) * 1000,
+            ', '.join(heavy) or 'none'))
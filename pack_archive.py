@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Pack Room EQ Wizard text exports into a single measurement archive
+# Created: 10.19.2026
+
+# Usage:
+# python pack_archive.py output.svgarc [file or directory ...]
+#
+# Directories are searched for text exports, each file may hold any number
+# of measurements. With no inputs the ./data directory is packed.
+
+from utils.archive import write_archive
+from utils.extract import iter_measurements
+import os
+import sys
+
+
+def find_files(inputs):
+    for item in inputs:
+        if not os.path.isdir(item):
+            yield item
+            continue
+        for root, dirs, files in os.walk(item):
+            dirs.sort()
+            for path in sorted(files):
+                # Igore hidden files
+                if (path.startswith('.')):
+                    continue
+                yield os.path.join(root, path)
+
+
+def read_all(inputs):
+    for path in find_files(inputs):
+        for measurement in iter_measurements(path):
+            yield measurement
+
+
+############################################################
+#
+#    Main
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('usage: python pack_archive.py output.svgarc [file or directory ...]')
+        sys.exit(1)
+
+    output = sys.argv[1]
+    inputs = sys.argv[2:] or ['./data']
+
+    count = write_archive(output, read_all(inputs))
+    print('packed %d measurements into %s' % (count, output))
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Benchmark a running render_server.py with the measurements in ./data
+# Created: 10.19.2026
+
+from utils.extract import get_data
+from utils.server import benchmark, fetch
+import asyncio
+import json
+import os
+
+############################################################
+#
+#    Main
+
+if __name__ == "__main__":
+    host, port = '127.0.0.1', 8000
+    source_dir = './data'
+
+    # Total requests to send and how many are kept open at once
+    total_requests = 200
+    concurrency = 32
+
+    traces = []
+    for path in sorted(os.listdir(source_dir)):
+        # Igore hidden files
+        if (path.startswith('.')):
+            continue
+        traces.append(get_data(os.path.join(source_dir, path)))
+
+    # Cycle through a handful of distinct plots so that some requests
+    # arrive while an identical one is in flight and get coalesced
+    payloads = []
+    for i in range(total_requests):
+        payloads.append({
+            'amp_range': [75, 105],
+            'freq_range': [20, 22000],
+            'traces': traces[:(i % len(traces)) + 1]
+        })
+
+    results = asyncio.run(benchmark(host, port, payloads, concurrency))
+
+    seconds = sorted(elapsed for status, elapsed in results)
+    ok = sum(1 for status, elapsed in results if status == 200)
+    print('requests: %d  ok: %d  failed: %d' % (len(results), ok, len(results) - ok))
+    print('client latency ms  p50: %.1f  p95: %.1f  max: %.1f' % (
+        seconds[len(seconds) // 2] * 1000,
+        seconds[int(len(seconds) * .95)] * 1000,
+        seconds[-1] * 1000))
+
+    status, body = asyncio.run(fetch(host, port, 'GET', '/metrics'))
+    print('server metrics:')
+    print(json.dumps(json.loads(body.decode('utf-8')), indent=2))
@@ -0,0 +1,26 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Serve SVG bode plots over HTTP, rendering in a pool of processes
+# Created: 10.19.2026
+
+# Start the server and POST plot descriptions to http://127.0.0.1:8000/render
+# Latency and queue metrics are available from http://127.0.0.1:8000/metrics
+# render_client.py can be used to benchmark a running server.
+
+from utils.server import RenderServer
+import asyncio
+
+############################################################
+#
+#    Main
+
+if __name__ == "__main__":
+    server = RenderServer(host='127.0.0.1', port=8000, max_pending=64)
+
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -1,6 +1,28 @@
 import unittest
-from utils.graph import Graph
+import utils.graph
+from utils.graph import Graph, GraphConfig
+from utils.server import RenderServer, fetch
+from utils.extract import get_data, iter_measurements
+from utils.archive import Archive, write_archive
+from utils.interpolate import make_path, make_paths, monotone_segments
+from utils.shared import SharedStore
+from utils.pyramid import make_pyramid
+from utils.color import get_streaming_trace_color
+from utils.grid import GraphGrid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import asyncio
+import json
 import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+
+def shared_trace_sum(handle, name):
+    freq, spl, phase = SharedStore.attach(handle).columns(name)
+    return float(spl.sum())
 
 
 class TestGraphClass(unittest.TestCase):
@@ -33,6 +55,62 @@ class TestGraphClass(unittest.TestCase):
         self.assertTupleEqual(g.amp_range, (60, 95))
         self.assertEqual(g.file_name, './default_output.svg')
 
+    def test_config_is_immutable(self):
+        g = Graph(graph_size=(400, 200), label_font={
+            'font_family': 'serif', 'font_size': '10', 'font_color': 'red'})
+        self.assertIsInstance(g.config, GraphConfig)
+        self.assertEqual(g.label_font['font_family'], 'serif')
+        with self.assertRaises(AttributeError):
+            g.graph_size = (1, 1)
+
+        h = Graph(config=g.config._replace(amp_range=(0, 10)))
+        self.assertTupleEqual(h.graph_size, (400, 200))
+        self.assertTupleEqual(h.amp_range, (0, 10))
+        self.assertTupleEqual(g.amp_range, (60, 95))
+
+    def test_partial_label_font(self):
+        g = Graph(label_font={'font_size': '9'})
+        self.assertEqual(g.label_font['font_size'], '9')
+        self.assertEqual(g.label_font['font_family'], 'sans-serif')
+        self.assertEqual(g.label_font['font_color'], 'black')
+
+        # Changing the module level dict doesn't reach new graphs
+        family = utils.graph.graph_label_font['font_family']
+        utils.graph.graph_label_font['font_family'] = 'x'
+        try:
+            g = Graph(label_font={'font_size': '9'})
+        finally:
+            utils.graph.graph_label_font['font_family'] = family
+        self.assertEqual(g.label_font['font_family'], 'sans-serif')
+
+    def test_config_with_layout_arguments(self):
+        config = Graph().config
+        with self.assertRaises(TypeError):
+            Graph(config=config, amp_range=(0, 10))
+
+    def test_legend_uses_instance_layout(self):
+        g = Graph(graph_size=(400, 200), graph_offset=(50, 20))
+        g.add_trace(get_data('data/AKG 451.txt'))
+        g.render()
+        legend_line = g.trace_labels.elements[0].get_xml().get('d')
+        self.assertTrue(legend_line.startswith('M 50 275.5'))
+
+    def test_concurrent_render(self):
+        data = [get_data('data/' + path) for path in sorted(os.listdir('data'))]
+
+        def render(size):
+            g = Graph(total_size=(size + 300, size), graph_size=(size, size // 2),
+                      graph_offset=(size // 10, 10))
+            for trace in data:
+                g.add_trace(trace)
+            g.render()
+            return g.dwg.tostring()
+
+        sizes = list(range(200, 800, 25))
+        expected = [render(size) for size in sizes]
+        with ThreadPoolExecutor(8) as executor:
+            self.assertListEqual(list(executor.map(render, sizes)), expected)
+
     def test_add_trace(self):
         g = Graph()
         g.add_trace([(0, 0), (1, 1)])
@@ -75,5 +153,365 @@ class TestGraphClass(unittest.TestCase):
         g.save()
 
 
+class TestRenderServer(unittest.TestCase):
+    payload = {
+        'amp_range': [60, 95],
+        'traces': [{'name': 'test', 'points': [[20, 70], [200, 80], [2000, 75], [20000, 65]]}]
+    }
+
+    def run_server(self, client, **options):
+        async def main():
+            server = await RenderServer(port=0, workers=1, **options).start()
+            try:
+                return await client(server)
+            finally:
+                await server.close()
+        return asyncio.run(main())
+
+    def test_coalesce_identical_requests(self):
+        async def client(server):
+            responses = await asyncio.gather(*[
+                fetch(server.host, server.port, 'POST', '/render', self.payload)
+                for i in range(4)])
+            return responses, server.metrics()
+
+        responses, metrics = self.run_server(client)
+        for status, body in responses:
+            self.assertEqual(status, 200)
+            self.assertTrue(body.startswith(b'<svg'))
+        self.assertEqual(metrics['renders'], 1)
+        self.assertEqual(metrics['coalesced'], 3)
+        self.assertEqual(metrics['in_flight'], 0)
+
+    def test_backpressure(self):
+        async def client(server):
+            too_large = await fetch(server.host, server.port, 'POST', '/render', self.payload)
+            return too_large
+
+        status, _ = self.run_server(client, max_body=10)
+        self.assertEqual(status, 413)
+
+        status, _ = self.run_server(client, max_pending=0)
+        self.assertEqual(status, 503)
+
+    def test_malformed_requests(self):
+        bad = [
+            {'traces': [{'name': 'no points'}]},
+            dict(self.payload, interpolation='foo'),
+            dict(self.payload, amp_range=5),
+            dict(self.payload, freq_range=[0, 100]),
+            dict(self.payload, label_font={'font_weight': 'bold'}),
+            {'traces': [{'points': [[20, 'loud']]}]},
+        ]
+
+        async def client(server):
+            responses = [await fetch(server.host, server.port, 'POST', '/render', payload)
+                         for payload in bad]
+            return responses, server.metrics()
+
+        responses, metrics = self.run_server(client)
+        for status, body in responses:
+            self.assertEqual(status, 400)
+        self.assertEqual(metrics['errors'], 0)
+        self.assertEqual(metrics['renders'], 0)
+
+    def test_recover_from_broken_pool(self):
+        async def client(server):
+            first = await fetch(server.host, server.port, 'POST', '/render', self.payload)
+            broken = server.executor
+            for process in list(broken._processes.values()):
+                process.kill()
+            # Give the pool a moment to notice its worker died
+            await asyncio.sleep(.5)
+            second = await fetch(server.host, server.port, 'POST', '/render',
+                                 dict(self.payload, amp_range=[50, 90]))
+            return first, second, server.executor is not broken
+
+        first, second, replaced = self.run_server(client)
+        self.assertEqual(first[0], 200)
+        self.assertEqual(second[0], 200)
+        self.assertTrue(replaced)
+
+
+class TestExtract(unittest.TestCase):
+    sources = ['data/AKG 451.txt', 'data/Shure SM-57.txt', 'data/Neumann U87.txt']
+
+    def setUp(self):
+        # Join several single measurement exports into one file
+        handle, self.path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(handle, 'w') as f:
+            for source in self.sources:
+                with open(source) as s:
+                    f.write(s.read())
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_iter_measurements(self):
+        measurements = list(iter_measurements(self.path))
+        self.assertEqual(len(measurements), len(self.sources))
+        for source, measurement in zip(self.sources, measurements):
+            expected = get_data(source)
+            self.assertEqual(measurement['name'], expected['name'])
+            self.assertListEqual(measurement['points'], expected['points'])
+        self.assertEqual(measurements[0]['header']['Smoothing'], '1/3 octave')
+
+    def test_iter_measurements_by_name(self):
+        measurements = list(iter_measurements(self.path, names=['Neumann U87']))
+        self.assertEqual(len(measurements), 1)
+        self.assertEqual(measurements[0]['name'], 'Neumann U87')
+        self.assertListEqual(measurements[0]['points'],
+                             get_data('data/Neumann U87.txt')['points'])
+
+
+class TestArchive(unittest.TestCase):
+    sources = ['data/AKG 451.txt', 'data/Shure SM-57.txt', 'data/Neumann U87.txt']
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.svgarc')
+        os.close(handle)
+        measurements = (next(iter_measurements(source)) for source in self.sources)
+        self.assertEqual(write_archive(self.path, measurements), len(self.sources))
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def test_read_columns(self):
+        with Archive(self.path) as archive:
+            self.assertListEqual(archive.names(), ['AKG 451', 'Shure SM-57', 'Neumann U87'])
+            self.assertTrue('Shure SM-57' in archive)
+            freq, spl, phase = archive.columns('Shure SM-57')
+            expected = get_data('data/Shure SM-57.txt')['points']
+            self.assertListEqual(list(zip(freq.tolist(), spl.tolist())), expected)
+            self.assertEqual(len(phase), len(expected))
+            self.assertEqual(archive.header('AKG 451')['Note'], 'AKG-1')
+            self.assertListEqual(archive.find(Measurement='Neumann U87'), ['Neumann U87'])
+            self.assertListEqual(archive.find(Smoothing='1/3 octave', Note='AKG-1'), ['AKG 451'])
+            self.assertListEqual(archive.find(Smoothing='none'), [])
+            self.assertListEqual(archive.find(Missing='field'), [])
+            self.assertListEqual(archive.find(Smoothing='1/3 octave'), archive.names())
+            self.assertDictEqual(archive.field_values('Measurement'),
+                                 {'AKG 451': [0], 'Shure SM-57': [1], 'Neumann U87': [2]})
+            del freq, spl, phase
+
+    def test_copied_trace_outlives_archive(self):
+        archive = Archive(self.path)
+        trace = archive.trace('AKG 451', copy=True)
+        archive.close()
+        self.assertTrue(archive.map.closed)
+        self.assertEqual(len(trace['freq']), len(get_data('data/AKG 451.txt')['points']))
+
+    def test_graph_from_archive(self):
+        with Archive(self.path) as archive:
+            g = Graph()
+            g.add_archive_traces(archive, ['AKG 451', 'Neumann U87'])
+            g.render()
+            self.assertEqual(len(g.trace_paths.elements), 2)
+
+
+class TestInterpolate(unittest.TestCase):
+    x = np.linspace(0, 700, 200)
+    points = np.column_stack((x, 150 + 100 * np.sin(x / 40)))
+
+    def test_chunked_path_matches(self):
+        with ThreadPoolExecutor(4) as executor:
+            for method in ('catmull-rom', 'monotone', 'linear'):
+                self.assertEqual(make_path(self.points, method),
+                                 make_path(self.points, method, executor, chunks=7))
+
+    def test_monotone_does_not_overshoot(self):
+        points = np.array([[0, 0], [1, 0], [2, 10], [3, 10], [4, 10.5], [5, 30]], dtype=float)
+        segments = monotone_segments(points)
+        low = np.minimum(points[:-1, 1], points[1:, 1])
+        high = np.maximum(points[:-1, 1], points[1:, 1])
+        for column in (1, 3):
+            self.assertTrue(np.all(segments[:, column] >= low))
+            self.assertTrue(np.all(segments[:, column] <= high))
+
+    def test_graph_interpolation(self):
+        g = Graph(interpolation='linear')
+        g.add_trace(get_data('data/AKG 451.txt'))
+        g.render()
+        path_string = g.trace_paths.elements[0].get_xml().get('d')
+        self.assertTrue(path_string.startswith('M '))
+        self.assertFalse('C' in path_string)
+        self.assertRaises(ValueError, make_path, self.points, 'cubic')
+
+
+class TestSharedStore(unittest.TestCase):
+    sources = ['data/AKG 451.txt', 'data/Shure SM-57.txt', 'data/Neumann U87.txt']
+
+    def test_workers_read_shared_columns(self):
+        measurements = [next(iter_measurements(source)) for source in self.sources]
+        with SharedStore.create(measurements) as store:
+            self.assertListEqual(store.names(), ['AKG 451', 'Shure SM-57', 'Neumann U87'])
+            with ProcessPoolExecutor(2) as executor:
+                sums = list(executor.map(shared_trace_sum,
+                                         [store.handle] * len(store), store.names()))
+            for measurement, total in zip(measurements, sums):
+                expected = sum(pair[1] for pair in measurement['points'])
+                self.assertAlmostEqual(total, expected, places=6)
+
+            copied = store.trace('AKG 451', copy=True)
+
+            g = Graph()
+            g.add_archive_traces(store, ['Shure SM-57'])
+            g.render()
+            self.assertEqual(len(g.trace_paths.elements), 1)
+            del g
+        self.assertListEqual(list(zip(copied['freq'].tolist(), copied['spl'].tolist())),
+                             measurements[0]['points'])
+
+    def test_handle_size_is_constant(self):
+        measurement = next(iter_measurements(self.sources[0]))
+        sizes = []
+        for count in (1, 500):
+            measurements = [dict(measurement, name='mic %d' % i) for i in range(count)]
+            with SharedStore.create(measurements) as store:
+                sizes.append(len(pickle.dumps(store.handle)))
+                attached_store = SharedStore.attach(store.handle)
+                self.assertEqual(len(attached_store), count)
+                self.assertTrue('mic %d' % (count - 1) in attached_store)
+                attached_store.close()
+        self.assertEqual(sizes[0], sizes[1])
+
+
+class TestStreaming(unittest.TestCase):
+    paths = ['data/' + path for path in sorted(os.listdir('data'))]
+
+    def setUp(self):
+        handle, self.stream_file = tempfile.mkstemp(suffix='.svg')
+        os.close(handle)
+        handle, self.render_file = tempfile.mkstemp(suffix='.svg')
+        os.close(handle)
+
+    def tearDown(self):
+        os.unlink(self.stream_file)
+        os.unlink(self.render_file)
+
+    def test_stream_matches_render(self):
+        g = Graph(file_name=self.render_file)
+        for path in self.paths:
+            g.add_trace(get_data(path))
+        g.render()
+        g.save()
+
+        g = Graph(file_name=self.stream_file)
+        g.save_stream((get_data(path) for path in self.paths), trace_count=len(self.paths))
+        self.assertListEqual(g.traces, [])
+
+        with open(self.render_file) as rendered, open(self.stream_file) as streamed:
+            self.assertEqual(rendered.read(), streamed.read())
+
+    def test_stream_without_count(self):
+        g = Graph(file_name=self.stream_file)
+        g.save_stream(get_data(path) for path in self.paths)
+        with open(self.stream_file) as f:
+            svg = f.read()
+        for path in self.paths:
+            self.assertTrue(get_data(path)['name'] in svg)
+
+        colors = get_streaming_trace_color()
+        palette = [next(colors) for i in range(50)]
+        self.assertEqual(len(set(palette)), 50)
+
+    def test_stream_more_traces_than_count(self):
+        g = Graph(file_name=self.stream_file)
+        g.save_stream((get_data(path) for path in self.paths), trace_count=1)
+        with open(self.stream_file) as f:
+            svg = f.read()
+        self.assertTrue(svg.endswith('</svg>'))
+        for path in self.paths:
+            self.assertTrue(get_data(path)['name'] in svg)
+
+
+class TestPyramid(unittest.TestCase):
+    def test_levels_and_tiles(self):
+        g = Graph(graph_size=(100, 50), interpolation='catmull-rom')
+        g.add_trace(get_data('data/Royer R-121.txt'))
+        pyramid = make_pyramid(g, levels=3)
+
+        self.assertEqual(pyramid['levels'], 3)
+        levels = pyramid['traces'][0]['levels']
+        self.assertListEqual([len(tiles) for tiles in levels], [1, 2, 4])
+
+        for level, tiles in enumerate(levels):
+            self.assertAlmostEqual(tiles[0]['freq_range'][0], 20)
+            self.assertAlmostEqual(tiles[-1]['freq_range'][1], 20000)
+            self.assertEqual(tiles[-1]['x_range'][1], 100 * 2 ** level)
+            for tile, next_tile in zip(tiles, tiles[1:]):
+                self.assertEqual(tile['freq_range'][1], next_tile['freq_range'][0])
+            for tile in tiles:
+                self.assertTrue(tile['d'].startswith('M '))
+                # Decimated to about one point per pixel column
+                self.assertLessEqual(tile['d'].count('C'), 100 + 2)
+
+    def test_tiles_share_boundary_segment(self):
+        for method in ('bspline', 'catmull-rom', 'monotone'):
+            g = Graph(graph_size=(100, 50), interpolation=method)
+            g.add_trace(get_data('data/Royer R-121.txt'))
+            levels = make_pyramid(g, levels=3)['traces'][0]['levels']
+            for tiles in levels[1:]:
+                for tile, next_tile in zip(tiles, tiles[1:]):
+                    last = tile['d'].split('C ')[-1]
+                    first = next_tile['d'].split('C ')[1]
+                    self.assertEqual(last, first)
+
+    def test_save_pyramid(self):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        g = Graph()
+        g.add_trace(get_data('data/Coles 4038.txt'))
+        g.save_pyramid(path, levels=2)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['traces'][0]['name'], 'Coles 4038')
+        os.unlink(path)
+
+
+class TestGraphGrid(unittest.TestCase):
+    options = {'total_size': (300, 200), 'graph_size': (220, 110), 'graph_offset': (50, 10),
+               'interpolation': 'monotone'}
+
+    def test_shared_frame(self):
+        data = [get_data('data/' + path) for path in sorted(os.listdir('data'))]
+        grid = GraphGrid(columns=2, **self.options)
+        for i in range(5):
+            grid.add_panel(data[i:i + 2])
+        grid.render()
+        svg = grid.dwg.tostring()
+
+        self.assertEqual(svg.count('id="panel_frame"'), 1)
+        self.assertEqual(svg.count('id="scale_lines"'), 1)
+        self.assertEqual(svg.count('<use '), 5)
+        self.assertTrue('width="600px"' in svg and 'height="600px"' in svg)
+        self.assertTrue('transform="translate(0,400)"' in svg)
+
+        # Panels draw the same paths a Graph with the same layout would
+        g = Graph(**self.options)
+        g.add_trace(data[4])
+        g.add_trace(data[5])
+        g.render()
+        for path in g.trace_paths.elements:
+            self.assertTrue(path.get_xml().get('d') in svg)
+
+    def test_batch_fit_matches(self):
+        traces = [np.column_stack((np.arange(n) * 10.0, np.cos(np.arange(n)) * 50))
+                  for n in (2, 7, 1, 30)]
+        for method in ('catmull-rom', 'monotone', 'linear', 'bspline'):
+            self.assertListEqual(make_paths(traces, method),
+                                 [make_path(points, method) for points in traces])
+
+
+class TestImports(unittest.TestCase):
+    def test_entry_points_import_lazily(self):
+        # Heavy dependencies should only load once something is rendered
+        check = ('import sys, svg_plotter, utils.graph, utils.extract, utils.server; '
+                 'utils.server.validate_request({"interpolation": "linear", "traces": []}); '
+                 'print(" ".join(m for m in ("numpy", "svgwrite") if m in sys.modules))')
+        output = subprocess.run([sys.executable, '-c', check], check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        self.assertEqual(output.strip(), '')
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,350 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Pack many measurements into a single memory-mapped archive file
+# Created: 10.19.2026
+
+'''
+######################
+# Overview
+######################
+
+Listing, opening and parsing thousands of small text exports is slow. An
+archive packs any number of measurements into one file that is memory
+mapped when it is opened, so reading a trace is a slice of the mapping
+rather than a parse.
+
+######################
+# File Layout
+######################
+
+All numbers are little endian.
+
+  magic        8 bytes   b'SVGPARC1'
+  data         for each measurement, three float64 columns back to back:
+                 frequency[n], spl[n], phase[n]
+               every column starts on an 8 byte boundary
+  headers      utf-8 JSON object of REW header fields for each measurement
+  fields       for each header field, a utf-8 JSON list of its k distinct
+               values, padded to an 8 byte boundary, then the uint64 arrays
+               starts[k + 1] and positions[starts[k]]: the measurements with
+               value i are at positions[starts[i]:starts[i + 1]]
+  directory    utf-8 JSON object mapping each header field to the byte
+               offset and byte length of its values and the byte offset of
+               its starts array
+  names        utf-8 JSON list of the measurement names
+  index        padded to an 8 byte boundary, four uint64 per measurement:
+                 n, byte offset of frequency column,
+                 byte offset of header, byte length of header
+  footer       uint64 byte offset of the index and number of measurements,
+               byte offset and byte length of the names, the same for the
+               directory, then the magic again
+
+The index is at the end so an archive can be written in a single pass from
+a stream of measurements. The spl and phase columns of a measurement
+start at offset + 8*n and offset + 16*n.
+
+Opening an archive only decodes the names and the small field directory,
+the index is read in place from the mapping. A header is decoded the
+first time it is asked for, and searching by a header field only decodes
+the list of values of that field.
+'''
+
+import json
+import mmap
+import struct
+
+import numpy as np
+
+
+magic = b'SVGPARC1'
+
+# index offset, measurement count, names offset, names length,
+# directory offset, directory length, magic
+footer = struct.Struct('<QQQQQQ8s')
+
+# uint64 columns of each row of the index
+index_fields = 4
+
+column_names = ('freq', 'spl', 'phase')
+
+
+def write_padding(f, offset):
+    ''' Pad a file to an 8 byte boundary, returns the new offset. '''
+    padding = -offset % 8
+    f.write(b'\0' * padding)
+    return offset + padding
+
+
+def write_archive(path, measurements):
+    '''
+    Write an iterable of measurement dictionaries, as produced by
+    utils.extract.iter_measurements, to an archive file. Measurements are
+    written out as they are read so the iterable may be a generator over
+    any number of files. Returns the number of measurements written.
+    '''
+    names = []
+    index = []
+    headers = []
+    # field -> value -> positions of the measurements with that value
+    fields = {}
+
+    with open(path, 'wb') as f:
+        f.write(magic)
+        offset = len(magic)
+
+        for measurement in measurements:
+            points = np.asarray(measurement['points'], dtype='<f8').reshape(-1, 2)
+            count = len(points)
+            phase = measurement.get('phase')
+            if phase is None or len(phase) != count:
+                phase = np.full(count, np.nan)
+
+            columns = np.empty((3, count), dtype='<f8')
+            columns[0] = points[:, 0]
+            columns[1] = points[:, 1]
+            columns[2] = phase
+            f.write(columns.tobytes())
+
+            header = measurement.get('header', {})
+            for field, value in header.items():
+                fields.setdefault(field, {}).setdefault(value, []).append(len(index))
+
+            names.append(measurement['name'])
+            index.append([count, offset])
+            headers.append(json.dumps(header, separators=(',', ':')).encode('utf-8'))
+            offset += columns.nbytes
+
+        # Headers are held back until the data is written so the columns
+        # stay contiguous and aligned
+        for entry, header in zip(index, headers):
+            f.write(header)
+            entry.extend([offset, len(header)])
+            offset += len(header)
+
+        directory = {}
+        for field, values in fields.items():
+            values_bytes = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+            f.write(values_bytes)
+            directory[field] = [offset, len(values_bytes)]
+            offset = write_padding(f, offset + len(values_bytes))
+
+            counts = [len(positions) for positions in values.values()]
+            arrays = np.concatenate([[0], np.cumsum(counts)] + list(values.values()))
+            f.write(arrays.astype('<u8').tobytes())
+            directory[field].append(offset)
+            offset += 8 * len(arrays)
+
+        directory_bytes = json.dumps(directory, separators=(',', ':')).encode('utf-8')
+        f.write(directory_bytes)
+        directory_offset = offset
+        offset += len(directory_bytes)
+
+        names_bytes = json.dumps(names, separators=(',', ':')).encode('utf-8')
+        f.write(names_bytes)
+        names_offset = offset
+        offset += len(names_bytes)
+
+        offset = write_padding(f, offset)
+        f.write(np.array(index, dtype='<u8').reshape(-1, index_fields).tobytes())
+        f.write(footer.pack(offset, len(index), names_offset, len(names_bytes),
+                            directory_offset, len(directory_bytes), magic))
+
+    return len(index)
+
+
+class ColumnStore:
+    '''
+    Read access to measurements whose frequency, spl and phase columns are
+    laid out back to back in a buffer, shared by Archive and
+    utils.shared.SharedStore. Subclasses open the buffer and call
+    index_columns() with the name, point count and column offset of every
+    measurement, offsets counting from data_offset.
+
+    Columns are returned as numpy arrays that point straight into the
+    buffer, nothing is copied until they are used. When several
+    measurements share a name, lookups by name return the first one, all of
+    them can be reached by position.
+
+    The buffer can't be released while arrays from columns() or trace()
+    still point into it, so close() leaves it open until the last of them
+    is garbage collected. Pass copy=True to trace() for traces that need to
+    outlive the store.
+    '''
+
+    def index_columns(self, buffer, data_offset, names, counts, offsets):
+        self.buffer = buffer
+        self.data_offset = data_offset
+        self.index_names = names
+        self.counts = counts
+        self.offsets = offsets
+        self.name_positions = None
+
+    @property
+    def positions(self):
+        ''' Dictionary of the position of each name, built on first use. '''
+        if self.name_positions is None:
+            names = self.index_names
+            # Reversed so the first measurement with a name wins
+            self.name_positions = dict(zip(reversed(names), range(len(names) - 1, -1, -1)))
+        return self.name_positions
+
+    def __len__(self):
+        return len(self.index_names)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        '''
+        Release the buffer. This does nothing while arrays from columns() or
+        trace() are still alive, the buffer is then released once the last
+        of them is garbage collected.
+        '''
+        try:
+            self.release()
+        except BufferError:
+            pass
+
+    def release(self):
+        raise NotImplementedError
+
+    def names(self):
+        return list(self.index_names)
+
+    def columns(self, name):
+        ''' Return the (freq, spl, phase) arrays for a measurement. '''
+        return self.columns_at(self.positions[name])
+
+    def columns_at(self, position):
+        count = int(self.counts[position])
+        offset = self.data_offset + int(self.offsets[position])
+        return tuple(
+            np.frombuffer(self.buffer, dtype='<f8', count=count, offset=offset + 8 * count * i)
+            for i in range(len(column_names)))
+
+    def trace(self, name, copy=False):
+        '''
+        Return a trace dictionary that can be passed to Graph.add_trace. The
+        frequency and amplitude are kept as columns instead of a list of
+        points. With copy the columns are copied out of the buffer so the
+        store can be closed while the trace is still in use.
+        '''
+        freq, spl, phase = self.columns(name)
+        if copy:
+            freq, spl = freq.copy(), spl.copy()
+        return {'name': name, 'freq': freq, 'spl': spl}
+
+
+class Archive(ColumnStore):
+    '''
+    Read only view of an archive file, see ColumnStore for reading columns.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.map[:len(magic)] != magic:
+            self.map.close()
+            raise ValueError('%s is not a measurement archive' % path)
+
+        (index_offset, count, names_offset, names_length,
+         directory_offset, directory_length, end_magic) = \
+            footer.unpack_from(self.map, len(self.map) - footer.size)
+        if end_magic != magic:
+            self.map.close()
+            raise ValueError('%s is truncated' % path)
+
+        names = json.loads(
+            self.map[names_offset:names_offset + names_length].decode('utf-8'))
+        self.directory = json.loads(
+            self.map[directory_offset:directory_offset + directory_length].decode('utf-8'))
+
+        # Rows of the index are read straight from the mapping
+        self.index = np.frombuffer(self.map, dtype='<u8', count=count * index_fields,
+                                   offset=index_offset).reshape(-1, index_fields)
+        self.index_columns(self.map, 0, names, self.index[:, 0], self.index[:, 1])
+
+        # Decoded headers by position and decoded field entries by field
+        self.headers = {}
+        self.fields = {}
+
+    def release(self):
+        # The index and field entries point into the mapping as well
+        self.index = self.counts = self.offsets = None
+        self.fields = {}
+        self.map.close()
+
+    def header(self, name):
+        return self.header_at(self.positions[name])
+
+    def header_at(self, position):
+        if position not in self.headers:
+            offset, length = (int(value) for value in self.index[position, 2:4])
+            self.headers[position] = json.loads(
+                self.map[offset:offset + length].decode('utf-8'))
+        return self.headers[position]
+
+    def field_entry(self, field):
+        '''
+        Return the list of values of a header field and its starts and
+        positions arrays, see the file layout above.
+        '''
+        if field not in self.fields:
+            if field in self.directory:
+                values_offset, values_length, starts_offset = self.directory[field]
+                values = json.loads(
+                    self.map[values_offset:values_offset + values_length].decode('utf-8'))
+                starts = np.frombuffer(self.map, dtype='<u8', count=len(values) + 1,
+                                       offset=starts_offset)
+                positions = np.frombuffer(self.map, dtype='<u8', count=int(starts[-1]),
+                                          offset=starts_offset + starts.nbytes)
+            else:
+                values, starts, positions = [], np.zeros(1, dtype='<u8'), np.zeros(0, dtype='<u8')
+            self.fields[field] = (values, starts, positions)
+        return self.fields[field]
+
+    def field_values(self, field):
+        '''
+        Return a dictionary mapping each value of a header field to the
+        positions of the measurements that have it.
+        '''
+        values, starts, positions = self.field_entry(field)
+        return {value: positions[starts[i]:starts[i + 1]].tolist()
+                for i, value in enumerate(values)}
+
+    def value_positions(self, field, value):
+        '''
+        Return a sorted array of the positions of measurements whose header
+        field has a value.
+        '''
+        values, starts, positions = self.field_entry(field)
+        try:
+            i = values.index(value)
+        except ValueError:
+            return positions[:0]
+        return positions[starts[i]:starts[i + 1]]
+
+    def find(self, **fields):
+        '''
+        Return the names of measurements whose header fields match every
+        keyword argument, for example find(Smoothing='1/3 octave').
+        '''
+        positions = None
+        for field, value in fields.items():
+            matches = self.value_positions(field, value)
+            positions = matches if positions is None else np.intersect1d(positions, matches)
+        if positions is None:
+            return self.names()
+        return [self.index_names[position] for position in positions.tolist()]
@@ -54,3 +54,17 @@ def get_trace_color(total_traces):
 
     for trace in range(total_traces):
         yield angle_to_hex_triplet(trace*(360/total_traces))
+
+
+def get_streaming_trace_color():
+    '''
+    This generator function returns colors for any number of traces when the
+    total isn't known ahead of time. Each hue is rotated from the last by the
+    golden angle so every new color lands in one of the widest gaps left between the
+    colors before it.
+    '''
+    golden_angle = 180 * (3 - 5 ** .5)
+    trace = 0
+    while True:
+        yield angle_to_hex_triplet((trace * golden_angle) % 360)
+        trace += 1
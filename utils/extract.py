@@ -31,4 +31,91 @@ def get_data(path):
 
     f.close()
 
-    return result
\ No newline at end of file
+    return result
+
+
+def parse_header(line):
+    '''
+    Split a header line like "* Smoothing: 1/3 octave" into a
+    ("Smoothing", "1/3 octave") pair. Returns None for header lines that
+    don't hold a field, like "*" or "* Freq(Hz), SPL(dB), Phase(degrees)".
+    '''
+    field, sep, value = line[1:].partition(':')
+    field = field.strip()
+    if not sep or not field or ',' in field:
+        return None
+    return field, value.strip()
+
+
+def iter_measurements(path, names=None):
+    '''
+    This generator reads a text file exported from Room EQ Wizard that may hold
+    any number of measurements, each introduced by its own block of "*" header
+    lines, and yields one measurement at a time as a dictionary like:
+
+    {
+        'name': 'Shure SM-57',
+        'header': {'Smoothing': '1/3 octave', ...},
+        'points': [(2.102, 35.533), ...],
+        'phase': [-113.2, ...]
+    }
+
+    Phase is nan for data lines that don't include a phase column.
+
+    Only the measurement currently being read is held in memory so files of any
+    size can be processed. Pass a collection of measurement names to only yield
+    those measurements, the data lines of the others are skipped without being
+    parsed.
+    '''
+    if names is not None:
+        names = set(names)
+
+    current = None
+    in_data = False
+
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('*'):
+                # A header line after data lines starts the next measurement
+                if current is None or in_data:
+                    if current is not None and current['keep']:
+                        yield current['result']
+                    current = {
+                        'keep': True,
+                        'result': {'name': '', 'header': {}, 'points': [], 'phase': []}
+                    }
+                    in_data = False
+
+                field = parse_header(line.rstrip())
+                if field is None:
+                    continue
+
+                current['result']['header'][field[0]] = field[1]
+                if field[0] == 'Measurement':
+                    current['result']['name'] = field[1]
+                    current['keep'] = names is None or field[1] in names
+                continue
+
+            if not line.strip():
+                continue
+
+            # Data lines before any header belong to an unnamed measurement
+            if current is None:
+                current = {
+                    'keep': names is None or '' in names,
+                    'result': {'name': '', 'header': {}, 'points': [], 'phase': []}
+                }
+            in_data = True
+
+            if not current['keep']:
+                continue
+
+            # Extract frequency and amplitude from line like:
+            # 2.102, 35.533, -113.200
+            values = line.split(',')[:3]
+            current['result']['points'].append((float(values[0]), float(values[1])))
+            current['result']['phase'].append(
+                float(values[2]) if len(values) > 2 else float('nan'))
+
+    if current is not None and current['keep']:
+        yield current['result']
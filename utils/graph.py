@@ -10,14 +10,19 @@
 #  Dependencies
 
 # external modules
-import utils.bspline as bspline
-from utils.color import get_trace_color
-import svgwrite
-from svgwrite import px
+from utils.color import get_trace_color, get_streaming_trace_color
 
 # standard library modules
+import shutil
+import tempfile
+from collections import namedtuple
+from itertools import chain
 from math import log10, floor, pow, ceil
 
+# svgwrite and numpy (through utils.interpolate) take most of the time it
+# takes to start up, so they are imported by the methods that use them.
+# Importing this module stays cheap for tools that only parse or validate.
+
 
 ########################################
 #  Default Parameters
@@ -37,6 +42,12 @@ freq_range = (20, 20000)
 # amplitude range of the graph in dB: (a, b) range
 amp_range = (60, 95)
 
+# curves utils.interpolate can draw through the points of a trace
+interpolation_methods = ('bspline', 'catmull-rom', 'monotone', 'linear')
+
+# curve drawn through the points of each trace, one of interpolation_methods
+interpolation = 'bspline'
+
 # graph label font
 graph_label_font = {
     'font_family': 'sans-serif',
@@ -44,6 +55,35 @@ graph_label_font = {
     'font_color': 'black'
 }
 
+########################################
+#  Configuration
+
+# Layout and styling of a single Graph. These are immutable and owned by
+# each instance so graphs with different layouts can render side by side,
+# including from several threads at once. Use _replace() to derive a
+# variation of a config.
+Font = namedtuple('Font', ['font_family', 'font_size', 'font_color'])
+
+GraphConfig = namedtuple('GraphConfig', [
+    'total_size',
+    'graph_size',
+    'graph_offset',
+    'freq_range',
+    'amp_range',
+    'interpolation',
+    'label_font'
+])
+
+default_config = GraphConfig(
+    total_size=total_size,
+    graph_size=graph_size,
+    graph_offset=graph_offset,
+    freq_range=freq_range,
+    amp_range=amp_range,
+    interpolation=interpolation,
+    label_font=Font(**graph_label_font)
+)
+
 ############################################################
 #
 #    Graph Class
@@ -52,31 +92,65 @@ graph_label_font = {
 class Graph:
     def __init__(
         self,
-        total_size=total_size,
-        graph_size=graph_size,
-        graph_offset=graph_offset,
-        freq_range=freq_range,
-        amp_range=amp_range,
-        file_name="./default_output.svg"
+        total_size=None,
+        graph_size=None,
+        graph_offset=None,
+        freq_range=None,
+        amp_range=None,
+        file_name="./default_output.svg",
+        interpolation=None,
+        label_font=None,
+        config=None
     ):
+        '''
+        The layout arguments default to the module level parameters above.
+        label_font may name only some of the font keys, the rest keep their
+        defaults. A GraphConfig passed as config takes the place of all of
+        the layout arguments, so giving both raises a TypeError.
+        '''
         ####################
         #  Graph attributes
 
-        self.total_size = total_size
-        self.graph_size = graph_size
-        self.graph_offset = graph_offset
-        self.freq_range = freq_range
-        self.amp_range = amp_range
+        layout = {
+            'total_size': total_size,
+            'graph_size': graph_size,
+            'graph_offset': graph_offset,
+            'freq_range': freq_range,
+            'amp_range': amp_range,
+            'interpolation': interpolation,
+            'label_font': label_font
+        }
+        given = {name: value for name, value in layout.items() if value is not None}
+
+        if config is not None:
+            if given:
+                raise TypeError('config can\'t be combined with layout arguments: %s'
+                                % ', '.join(sorted(given)))
+        else:
+            if 'label_font' in given:
+                given['label_font'] = Font(**dict(default_config.label_font._asdict(),
+                                                    **given['label_font']))
+            for name in ('total_size', 'graph_size', 'graph_offset', 'freq_range', 'amp_range'):
+                if name in given:
+                    given[name] = tuple(given[name])
+            config = default_config._replace(**given)
+        self.config = config
         self.traces = []
 
         ####################
         #  SVG Attributes
 
+        import svgwrite
+
+        # svgwrite's pixel unit, kept here so the render methods don't need
+        # their own imports
+        self.px = svgwrite.px
+
         self.file_name = file_name
         # Create drawing object to render to
         self.dwg = svgwrite.Drawing(
             filename=self.file_name,
-            size=(self.total_size[0] * px, self.total_size[1] * px),
+            size=(self.total_size[0] * self.px, self.total_size[1] * self.px),
             # Set debug false for production!
             debug=False
         )
@@ -91,31 +165,72 @@ class Graph:
             self.dwg.g(id='trace_labels', fill='black'))
         self.clipping_mask = self.dwg.add(self.dwg.mask(id='clipping_mask'))
 
+    ####################
+    #  Read only views of the config
+
+    @property
+    def total_size(self):
+        return self.config.total_size
+
+    @property
+    def graph_size(self):
+        return self.config.graph_size
+
+    @property
+    def graph_offset(self):
+        return self.config.graph_offset
+
+    @property
+    def freq_range(self):
+        return self.config.freq_range
+
+    @property
+    def amp_range(self):
+        return self.config.amp_range
+
+    @property
+    def interpolation(self):
+        return self.config.interpolation
+
+    @property
+    def label_font(self):
+        return self.config.label_font._asdict()
+
     def render(self):
         '''
         Create output drawing. Note that the order drawing methods are called in
         represents the order in which they appear.
         '''
+        self.render_frame()
+        self.draw_traces()
+
+    def render_frame(self):
+        '''
+        Draw everything but the traces: background, scale lines, labels, the
+        clipping mask and the empty group the trace paths go in.
+        '''
+        label_font = self.label_font
+
         self.draw_background()
         hline_list = self.draw_h_lines()
         vline_list = self.draw_v_lines()
 
         # Axes and labels
-        self.draw_v_labels(vline_list, graph_label_font)
+        self.draw_v_labels(vline_list, label_font)
 
         self.draw_axis_lable('Frequency in Hz',
                              self.graph_size[0] + self.graph_offset[0] + 5,
                              self.graph_size[1] + self.graph_offset[1] + 10,
                              45,
-                             **graph_label_font)
+                             **label_font)
 
-        self.draw_h_labels(hline_list, graph_label_font)
+        self.draw_h_labels(hline_list, label_font)
 
         self.draw_axis_lable('Amplitude in dB',
                              self.graph_offset[0] - 90,
                              self.graph_offset[1] + 5,
                              0,
-                             **graph_label_font)
+                             **label_font)
 
         # Create Clipping mask
         self.clipping_mask.add(self.dwg.rect(
@@ -128,17 +243,89 @@ class Graph:
         self.trace_paths = self.dwg.add(self.dwg.g(id='path', stroke_width=2,
                                                    fill='white', fill_opacity="0", mask="url(#clipping_mask)"))
 
-        self.draw_traces()
-
     def save(self):
         self.dwg.save()
 
+    def save_stream(self, traces, trace_count=None):
+        '''
+        Render and save traces read one at a time from any iterable, such as
+        a generator over measurement files, instead of from self.traces. Each
+        trace is fitted and written out before the next one is read so memory
+        use doesn't grow with the number of traces.
+
+        Colors are spread over trace_count traces like render() does when the
+        count is known, otherwise they come from a palette that doesn't need
+        to know how many traces there will be. With the count, the file is the
+        same as the one render() and save() produce. Traces beyond trace_count
+        take their colors from the streaming palette.
+        '''
+        if trace_count is None:
+            color_generator = get_streaming_trace_color()
+        else:
+            color_generator = chain(get_trace_color(trace_count), get_streaming_trace_color())
+
+        self.render_frame()
+
+        # The trace labels, mask and trace paths are written by hand after
+        # the rest of the drawing so traces can be added as they arrive
+        streamed = [self.trace_labels, self.clipping_mask, self.trace_paths]
+        for element in streamed:
+            self.dwg.elements.remove(element)
+        head = self.dwg.tostring()
+        for element in streamed:
+            self.dwg.elements.append(element)
+
+        label_font = self.label_font
+        label_start_x = self.graph_offset[0]
+        label_start_y = self.graph_offset[1] + self.graph_size[1] + 60
+
+        with open(self.file_name, 'w', encoding='utf-8') as f, \
+                tempfile.TemporaryFile('w+', encoding='utf-8') as paths:
+            f.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+            f.write(head[:-len('</svg>')])
+            f.write(start_tag(self.trace_labels))
+
+            # Labels come before the paths in the document so the paths are
+            # held in a temporary file until the last trace has been read
+            for trace in traces:
+                color = next(color_generator)
+                paths.write(self.trace_path(trace, color).tostring())
+                for element in self.trace_label_elements(
+                        trace['name'], color, label_start_x, label_start_y, 0, **label_font):
+                    f.write(element.tostring())
+                label_start_y += 20
+
+            f.write('</g>')
+            f.write(self.clipping_mask.tostring())
+            f.write(start_tag(self.trace_paths))
+            paths.seek(0)
+            shutil.copyfileobj(paths, f)
+            f.write('</g></svg>')
+
+    def save_pyramid(self, file_name, levels=4):
+        '''
+        Save a JSON manifest of path tiles at several zoom levels for a viewer
+        to swap between, see utils/pyramid.py. This doesn't need render().
+        '''
+        from utils.pyramid import save_pyramid
+        save_pyramid(self, file_name, levels)
+
     ########################################
     #  Data Oriented Methods
 
     def add_trace(self, trace):
         self.traces.append(trace)
 
+    def add_archive_traces(self, archive, names):
+        '''
+        Add traces by name from an open utils.archive.Archive or
+        utils.shared.SharedStore. The traces keep their columns as views into
+        the archive so nothing is copied until they are drawn, which means the
+        archive has to stay open until the graph has been rendered.
+        '''
+        for name in names:
+            self.add_trace(archive.trace(name))
+
     def log_scale(self, f, a):
         '''
         This function takes a frequency (Hz) and amplitude (dB) and outputs an
@@ -163,6 +350,28 @@ class Graph:
         y = ((y_end - y_start) - y) + y_start
         return (x, y)
 
+    def log_scale_trace(self, trace):
+        '''
+        Vectorized log_scale for a whole trace. Returns an array with an x,y
+        row for each point of the trace.
+        '''
+        import numpy as np
+
+        if 'points' in trace:
+            pairs = np.asarray(trace['points'], dtype=float).reshape(-1, 2)
+            f, a = pairs[:, 0], pairs[:, 1]
+        else:
+            f, a = np.asarray(trace['freq']), np.asarray(trace['spl'])
+
+        log_range = log10(self.freq_range[1]) - log10(self.freq_range[0])
+        x = (np.log10(f) - log10(self.freq_range[0])) / log_range
+        x = x * self.graph_size[0] + self.graph_offset[0]
+
+        y = (a - self.amp_range[0])/(self.amp_range[1] - self.amp_range[0])
+        y = (self.graph_size[1] - y * self.graph_size[1]) + self.graph_offset[1]
+
+        return np.column_stack((x, y))
+
     ########################################
     #  Render Methods
 
@@ -171,6 +380,7 @@ class Graph:
         This function draws a rectangle behind the plotting area.
         Call this function first so it's in the back.
         '''
+        px = self.px
 
         background_fill = '#fcfcfc'
         background_stroke = '#000000'
@@ -199,6 +409,7 @@ class Graph:
                 or y >= self.graph_offset[1] + self.graph_size[1]):
             return
 
+        px = self.px
         point = self.dwg.circle(center=(x*px, y*px), r='2px',
                                 fill=color, stroke=color, stroke_width=2)
         self.background.add(point)
@@ -364,19 +575,27 @@ class Graph:
 
     def draw_traces(self):
         color_generator = get_trace_color(len(self.traces))
-        label_start_x = graph_offset[0]
-        label_start_y = graph_offset[1] + graph_size[1] + 60
+        label_font = self.label_font
+        label_start_x = self.graph_offset[0]
+        label_start_y = self.graph_offset[1] + self.graph_size[1] + 60
 
         for trace in self.traces:
             color = next(color_generator)
-            log_points = [list(self.log_scale(*pair))
-                          for pair in trace["points"]]
-            path_string = bspline.make_curve(log_points)
-            self.trace_paths.add(self.dwg.path(d=path_string, stroke=color))
+            self.trace_paths.add(self.trace_path(trace, color))
             self.draw_trace_label(
-                trace['name'], color, label_start_x, label_start_y, 0, **graph_label_font)
+                trace['name'], color, label_start_x, label_start_y, 0, **label_font)
             label_start_y += 20
 
+    def trace_path(self, trace, color):
+        '''
+        Fit a curve through a trace and return it as a path element.
+        '''
+        from utils.interpolate import make_path
+
+        log_points = self.log_scale_trace(trace)
+        path_string = make_path(log_points, self.interpolation)
+        return self.dwg.path(d=path_string, stroke=color)
+
     def draw_trace_label(
             self,
             text,
@@ -388,6 +607,21 @@ class Graph:
             font_size='',
             font_color=''):
 
+        for element in self.trace_label_elements(
+                text, trace_color, x, y, rotate, font_family, font_size, font_color):
+            self.trace_labels.add(element)
+
+    def trace_label_elements(
+            self,
+            text,
+            trace_color,
+            x,
+            y,
+            rotate,
+            font_family='',
+            font_size='',
+            font_color=''):
+
         msg = self.dwg.text(
             text,
             insert=(x + 20, y),
@@ -395,9 +629,17 @@ class Graph:
             font_size=font_size,
             fill=font_color)
 
-        self.trace_labels.add(self.dwg.path(
-            d=f'M {x} {y - 4.5} L {x + 16} {y - 4.5} z', stroke_width=3, stroke=trace_color))
+        line = self.dwg.path(
+            d=f'M {x} {y - 4.5} L {x + 16} {y - 4.5} z', stroke_width=3, stroke=trace_color)
 
         msg.rotate(rotate, (x, y))
 
-        self.trace_labels.add(msg)
+        return [line, msg]
+
+
+def start_tag(element):
+    '''
+    Return the start tag of an svgwrite element that has no children, so
+    children can be written after it as they are made.
+    '''
+    return element.tostring()[:-len(' />')] + '>'
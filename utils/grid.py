@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Render many small graphs side by side in a single SVG document
+# Created: 10.19.2026
+
+'''
+######################
+# Overview
+######################
+
+A page of small multiples, one small frequency response graph per panel,
+could be built from a separate Graph and SVG file for each panel. Most of
+the markup of a small panel is the same in every panel though: the
+background, scale lines, axis labels and clipping mask only depend on the
+layout and ranges, which the panels share.
+
+A GraphGrid draws those parts once into <defs> and places them in each
+panel with <use>, so a panel only adds its own traces and legend:
+
+  <defs>
+    <g id="panel_frame"> background, scale lines, labels </g>
+    <mask id="clipping_mask"> ... </mask>
+  </defs>
+  <g id="panel_0" transform="translate(0,0)">
+    <use xlink:href="#panel_frame" />
+    <g mask="url(#clipping_mask)"> trace paths </g>
+    <g> legend </g>
+  </g>
+  ...
+
+Masks are positioned in the coordinate system of the element that uses
+them, so the one mask clips every translated panel. The traces of each
+panel are fitted together with interpolate.make_paths.
+'''
+
+from math import ceil
+
+from utils.color import get_trace_color
+from utils.graph import Graph
+
+
+class GraphGrid:
+    def __init__(
+        self,
+        columns=4,
+        file_name="./default_output.svg",
+        config=None,
+        **options
+    ):
+        '''
+        Panels are laid out left to right in `columns` columns. Each panel
+        is total_size big and is set up by the same keyword arguments as a
+        Graph (total_size, graph_size, graph_offset, freq_range, amp_range,
+        interpolation, label_font) or by a GraphConfig.
+        '''
+        self.columns = columns
+        self.file_name = file_name
+
+        # The template graph holds the shared panel config and draws the
+        # parts of a panel that go in <defs>
+        self.template = Graph(file_name=file_name, config=config, **options)
+        self.config = self.template.config
+        self.panels = []
+
+    def add_panel(self, traces):
+        '''
+        Add a panel showing a list of traces, returns the panel's index.
+        '''
+        self.panels.append(list(traces))
+        return len(self.panels) - 1
+
+    def panel_offset(self, index):
+        width, height = self.config.total_size
+        return ((index % self.columns) * width, (index // self.columns) * height)
+
+    def render(self):
+        import svgwrite
+        from svgwrite import px
+        from utils.interpolate import make_paths
+
+        template = self.template
+        template.render_frame()
+
+        rows = max(ceil(len(self.panels) / self.columns), 1)
+        columns = min(max(len(self.panels), 1), self.columns)
+        width, height = self.config.total_size
+
+        self.dwg = svgwrite.Drawing(
+            filename=self.file_name,
+            size=(columns * width * px, rows * height * px),
+            # Set debug false for production!
+            debug=False
+        )
+
+        ####################
+        #  Shared defs
+
+        frame = self.dwg.defs.add(self.dwg.g(id='panel_frame'))
+        frame.add(template.background)
+        frame.add(template.scale_lines)
+        frame.add(template.line_labels)
+        self.dwg.defs.add(template.clipping_mask)
+
+        ####################
+        #  Panels
+
+        label_font = template.label_font
+        label_start_x = self.config.graph_offset[0]
+
+        for index, traces in enumerate(self.panels):
+            panel = self.dwg.add(self.dwg.g(
+                id='panel_%d' % index,
+                transform='translate(%d,%d)' % self.panel_offset(index)))
+            panel.add(self.dwg.use('#panel_frame'))
+
+            trace_paths = panel.add(self.dwg.g(stroke_width=2, fill='white', fill_opacity="0",
+                                               mask="url(#clipping_mask)"))
+            trace_labels = panel.add(self.dwg.g(fill='black'))
+
+            path_strings = make_paths(
+                [template.log_scale_trace(trace) for trace in traces], self.config.interpolation)
+
+            color_generator = get_trace_color(len(traces))
+            label_start_y = self.config.graph_offset[1] + self.config.graph_size[1] + 60
+
+            for trace, path_string in zip(traces, path_strings):
+                color = next(color_generator)
+                trace_paths.add(self.dwg.path(d=path_string, stroke=color))
+                for element in template.trace_label_elements(
+                        trace['name'], color, label_start_x, label_start_y, 0, **label_font):
+                    trace_labels.add(element)
+                label_start_y += 20
+
+    def save(self):
+        self.dwg.save()
@@ -0,0 +1,255 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Turn a list of points into an SVG path with a choice of curve types
+# Created: 10.19.2026
+
+'''
+######################
+# Overview
+######################
+
+The relaxed B-spline in bspline.py passes through every point but finding
+its control points means solving one linear system for the whole trace.
+The curves here are local: the control points of each segment depend only
+on the points either side of it, so they are found for every segment at
+once with array arithmetic and a trace can be split into chunks that are
+worked on independently.
+
+  bspline       relaxed cubic B-spline from bspline.py
+  catmull-rom   Catmull-Rom spline, tangent at S_{i} is (S_{i+1} - S_{i-1}) / 2
+  monotone      monotone cubic in x (Fritsch-Butland / PCHIP slopes), never
+                overshoots between points so it doesn't invent peaks or dips
+  linear        straight lines between points, the cheapest path for a
+                browser to draw when traces are very dense
+
+######################
+# Hermite to Bezier
+######################
+
+A cubic segment from S_{i} to S_{i+1} with tangents T_{i} and T_{i+1} is
+drawn with the bezier control points:
+
+  C1 = S_{i} + T_{i} / 3
+  C2 = S_{i+1} - T_{i+1} / 3
+
+For the monotone curve the tangents are slopes m, the x step of each
+control point is a third of the segment width h:
+
+  C1 = (x_{i} + h/3, y_{i} + m_{i} * h/3)
+  C2 = (x_{i+1} - h/3, y_{i+1} - m_{i+1} * h/3)
+
+The path is a single "M" followed by one "C" per segment.
+
+######################
+# Chunks
+######################
+
+The control points of segments a to b only depend on points a-1 to b+1,
+so make_path can hand slices of a trace with one point of overlap on each
+side to an executor and join the resulting strings.
+'''
+
+import numpy as np
+
+import utils.bspline as bspline
+from utils.graph import interpolation_methods as methods
+
+
+def trace_ends(points, firsts, lasts):
+    '''
+    Index arrays of the first and last point of each trace in points,
+    a single trace by default.
+    '''
+    if firsts is None:
+        return np.array([0]), np.array([len(points) - 1])
+    return np.asarray(firsts), np.asarray(lasts)
+
+
+def catmull_rom_segments(points, firsts=None, lasts=None):
+    tangents = np.empty_like(points)
+    tangents[1:-1] = (points[2:] - points[:-2]) / 2
+    # One sided at the ends
+    firsts, lasts = trace_ends(points, firsts, lasts)
+    tangents[firsts] = points[firsts + 1] - points[firsts]
+    tangents[lasts] = points[lasts] - points[lasts - 1]
+
+    segments = np.empty((len(points) - 1, 6))
+    segments[:, 0:2] = points[:-1] + tangents[:-1] / 3
+    segments[:, 2:4] = points[1:] - tangents[1:] / 3
+    segments[:, 4:6] = points[1:]
+    return segments
+
+
+def monotone_segments(points, firsts=None, lasts=None):
+    x = points[:, 0]
+    y = points[:, 1]
+    h = np.diff(x)
+
+    # Slope of each segment, flat where two points share an x position
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d = np.where(h != 0, np.diff(y) / h, 0.0)
+
+    # Weighted harmonic mean of neighbouring slopes, zero at local extrema
+    m = np.empty(len(points))
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (w1 + w2) / (w1 / d[:-1] + w2 / d[1:])
+    m[1:-1] = np.where(d[:-1] * d[1:] > 0, mean, 0.0)
+    # Slope of the first and last segment at the ends
+    firsts, lasts = trace_ends(points, firsts, lasts)
+    m[firsts] = d[firsts]
+    m[lasts] = d[lasts - 1]
+
+    segments = np.empty((len(points) - 1, 6))
+    segments[:, 0] = x[:-1] + h / 3
+    segments[:, 1] = y[:-1] + m[:-1] * h / 3
+    segments[:, 2] = x[1:] - h / 3
+    segments[:, 3] = y[1:] - m[1:] * h / 3
+    segments[:, 4:6] = points[1:]
+    return segments
+
+
+def bspline_segments(points):
+    '''
+    The control points bspline.make_curve draws through a single trace of
+    at least two points, with the "1 4 1" system solved by elimination
+    along its three diagonals instead of by inverting it.
+    '''
+    count = len(points) - 2
+    b = np.empty_like(points)
+    b[0], b[-1] = points[0], points[-1]
+
+    if count > 0:
+        rhs = 6 * points[1:-1]
+        rhs[0] -= points[0]
+        rhs[-1] -= points[-1]
+
+        # Forward sweep then back substitution
+        diagonal = np.empty(count)
+        diagonal[0] = 4.0
+        for i in range(1, count):
+            diagonal[i] = 4 - 1 / diagonal[i - 1]
+            rhs[i] -= rhs[i - 1] / diagonal[i - 1]
+        b[count] = rhs[count - 1] / diagonal[count - 1]
+        for i in range(count - 2, -1, -1):
+            b[i + 1] = (rhs[i] - b[i + 2]) / diagonal[i]
+
+    segments = np.empty((len(points) - 1, 6))
+    segments[:, 0:2] = b[:-1] + (b[1:] - b[:-1]) / 3
+    segments[:, 2:4] = b[:-1] + (b[1:] - b[:-1]) * 2 / 3
+    segments[:, 4:6] = points[1:]
+    return segments
+
+
+def segments(points, method, firsts=None, lasts=None):
+    '''
+    Return one row per segment: the end point for lines or the two control
+    points and end point for curves. Several traces can be joined end to end
+    in points, with firsts and lasts holding the index of the first and last
+    point of each, the rows joining one trace to the next are meaningless.
+    The bspline method only takes a single trace.
+    '''
+    if method == 'bspline':
+        return bspline_segments(points)
+    if method == 'linear':
+        return points[1:]
+    if method == 'catmull-rom':
+        return catmull_rom_segments(points, firsts, lasts)
+    if method == 'monotone':
+        return monotone_segments(points, firsts, lasts)
+    raise ValueError('unknown interpolation method: %s' % method)
+
+
+def format_segments(rows):
+    '''
+    Format segment rows as path commands, "L x,y" for lines and
+    "C x1,y1 x2,y2 x,y" for curves.
+    '''
+    if rows.shape[1] == 2:
+        return ('L %f,%f ' * len(rows)) % tuple(rows.ravel())
+    return ('C %f,%f %f,%f %f,%f ' * len(rows)) % tuple(rows.ravel())
+
+
+def chunk_string(points, method, skip, count):
+    '''
+    Return the path commands for `count` segments starting `skip` segments
+    into `points`. The points before and after those segments are only
+    there to give the end tangents their neighbours.
+    '''
+    return format_segments(segments(points, method)[skip:skip + count])
+
+
+def make_path(points, method='catmull-rom', executor=None, chunks=1):
+    '''
+    Return an SVG path string through a list or array of (x, y) points.
+
+    With an executor (for example a concurrent.futures.ProcessPoolExecutor)
+    the local methods are split into `chunks` pieces that are worked on in
+    parallel, the bspline method is always computed in one piece.
+    '''
+    if method not in methods:
+        raise ValueError('unknown interpolation method: %s' % method)
+
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    count = len(points)
+
+    if method == 'bspline':
+        # The B-spline system needs at least two middle points, shorter
+        # runs get the local curve through the same points instead
+        if count >= 4:
+            return bspline.make_curve(points.tolist())
+        method = 'catmull-rom'
+
+    if count == 0:
+        return ''
+
+    path_string = 'M %f %f ' % tuple(points[0])
+    if count == 1:
+        return path_string
+
+    if executor is None or chunks <= 1:
+        return path_string + chunk_string(points, method, 0, count - 1)
+
+    bounds = np.linspace(0, count - 1, chunks + 1).astype(int)
+    futures = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if stop == start:
+            continue
+        first = max(start - 1, 0)
+        futures.append(executor.submit(
+            chunk_string, points[first:stop + 2], method, start - first, stop - start))
+
+    return path_string + ''.join(future.result() for future in futures)
+
+
+def make_paths(point_lists, method='catmull-rom'):
+    '''
+    Return a path string for each of several traces. The local methods fit
+    every trace in one pass over all of their points joined together, the
+    bspline method solves each trace on its own.
+    '''
+    if method not in methods:
+        raise ValueError('unknown interpolation method: %s' % method)
+
+    arrays = [np.asarray(points, dtype=float).reshape(-1, 2) for points in point_lists]
+    # B-splines and traces too short to have segments are drawn one by one
+    batch = [i for i, points in enumerate(arrays)
+             if method != 'bspline' and len(points) >= 2]
+
+    paths = [None] * len(arrays)
+    if batch:
+        lengths = np.array([len(arrays[i]) for i in batch])
+        lasts = np.cumsum(lengths) - 1
+        firsts = lasts - lengths + 1
+        rows = segments(np.concatenate([arrays[i] for i in batch]), method, firsts, lasts)
+        for i, first, last in zip(batch, firsts, lasts):
+            # Segment k joins point k to k + 1 so a trace's segments are
+            # first to last - 1
+            paths[i] = 'M %f %f ' % tuple(arrays[i][0]) + format_segments(rows[first:last])
+
+    return [make_path(points, method) if path is None else path
+            for points, path in zip(arrays, paths)]
@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Precompute tiles of path data at several zoom levels for a viewer
+# Created: 10.19.2026
+
+'''
+######################
+# Overview
+######################
+
+A viewer that lets people zoom into a narrow band of frequencies would
+otherwise need a new render with a new freq_range for every zoom. Instead
+the path data of each trace is computed once for a pyramid of zoom levels.
+Level 0 is the whole graph, level l is 2^l times wider and is split into
+2^l tiles that are each one graph wide. A viewer picks the level that
+matches its zoom and swaps in the tiles it needs.
+
+######################
+# Coordinates
+######################
+
+Paths at level l are in a coordinate system where the full frequency range
+runs from x = 0 to x = width * 2^l and the amplitude range from y = height
+(bottom) to y = 0 (top), width and height being the graph_size of the
+Graph. Tile t of a level covers x from t * width to (t + 1) * width, so
+translating a tile by -t * width places it on the graph.
+
+######################
+# Detail
+######################
+
+At each level the points of a trace are binned into pixel columns and each
+column with more than one point is replaced by the mean of its points, so
+a tile never holds many more points than it has pixels across. The log
+scaling is done once per trace and the binning for each level is done with
+array operations over the whole trace. The curve of each level is then
+fitted once over the whole trace with the Graph's interpolation method and
+its segments are split between the tiles. A tile holds every segment that
+crosses into it, so the segment crossing the edge between two tiles is the
+same in both and the curve doesn't jump where a viewer joins them.
+
+######################
+# Manifest
+######################
+
+{
+  "freq_range": [20, 20000], "amp_range": [60, 95],
+  "graph_size": [700, 300], "levels": 4,
+  "traces": [
+    {"name": "Shure SM-57", "color": "#...",
+     "levels": [[{"freq_range": [f0, f1], "x_range": [x0, x1], "d": "M ..."}, ...],
+                ...]}
+  ]
+}
+'''
+
+import json
+from math import log10
+
+import numpy as np
+
+from utils.color import get_trace_color
+from utils.interpolate import segments, format_segments
+
+
+def scale_trace(graph, trace):
+    '''
+    Return the position of each point of a trace as a fraction of the graph
+    width (0 to 1 across the frequency range) and a y coordinate in pixels
+    (0 at the top of the graph), sorted by frequency.
+    '''
+    if 'points' in trace:
+        pairs = np.asarray(trace['points'], dtype=float).reshape(-1, 2)
+        f, a = pairs[:, 0], pairs[:, 1]
+    else:
+        f, a = np.asarray(trace['freq'], dtype=float), np.asarray(trace['spl'], dtype=float)
+
+    low, high = log10(graph.freq_range[0]), log10(graph.freq_range[1])
+    fraction = (np.log10(f) - low) / (high - low)
+
+    height = graph.graph_size[1]
+    y = height - (a - graph.amp_range[0]) / (graph.amp_range[1] - graph.amp_range[0]) * height
+
+    order = np.argsort(fraction, kind='stable')
+    return fraction[order], y[order]
+
+
+def decimate(x, y):
+    '''
+    Replace the points that fall in the same pixel column with their mean.
+    '''
+    if len(x) < 2:
+        return x, y
+    columns = np.floor(x)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(columns)) + 1))
+    counts = np.diff(np.append(starts, len(x)))
+    return np.add.reduceat(x, starts) / counts, np.add.reduceat(y, starts) / counts
+
+
+def tile_frequency(graph, fraction):
+    low, high = log10(graph.freq_range[0]), log10(graph.freq_range[1])
+    return pow(10, low + fraction * (high - low))
+
+
+def trace_levels(graph, trace, levels):
+    fraction, y = scale_trace(graph, trace)
+    width = graph.graph_size[0]
+
+    result = []
+    for level in range(levels):
+        tiles = 2 ** level
+        x, level_y = decimate(fraction * width * tiles, y)
+        points = np.column_stack((x, level_y))
+        rows = segments(points, graph.interpolation) if len(points) >= 2 else points[:0]
+
+        # Segment k joins point k to k + 1, a tile gets the segments that
+        # end after its left edge and start before its right edge
+        edges = np.arange(tiles + 1) * width
+        firsts = np.searchsorted(x[1:], edges[:-1], side='right')
+        stops = np.searchsorted(x[:-1], edges[1:], side='left')
+
+        level_tiles = []
+        for tile in range(tiles):
+            first, stop = firsts[tile], stops[tile]
+            if len(points):
+                d = 'M %f %f ' % tuple(points[first]) + format_segments(rows[first:stop])
+            else:
+                d = ''
+            level_tiles.append({
+                'freq_range': [tile_frequency(graph, tile / tiles),
+                               tile_frequency(graph, (tile + 1) / tiles)],
+                'x_range': [float(edges[tile]), float(edges[tile + 1])],
+                'd': d
+            })
+        result.append(level_tiles)
+
+    return result
+
+
+def make_pyramid(graph, levels=4):
+    '''
+    Return a manifest of path data for every trace of a Graph at `levels`
+    zoom levels.
+    '''
+    color_generator = get_trace_color(len(graph.traces))
+
+    traces = []
+    for trace in graph.traces:
+        traces.append({
+            'name': trace['name'],
+            'color': next(color_generator),
+            'levels': trace_levels(graph, trace, levels)
+        })
+
+    return {
+        'freq_range': list(graph.freq_range),
+        'amp_range': list(graph.amp_range),
+        'graph_size': list(graph.graph_size),
+        'levels': levels,
+        'traces': traces
+    }
+
+
+def save_pyramid(graph, file_name, levels=4):
+    with open(file_name, 'w') as f:
+        json.dump(make_pyramid(graph, levels), f, separators=(',', ':'))
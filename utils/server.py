@@ -0,0 +1,445 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Asyncio HTTP service that renders Graph plots in a process pool
+# Created: 10.19.2026
+
+'''
+######################
+# Overview
+######################
+
+The render server accepts a JSON description of a plot and answers with
+the rendered SVG document. Rendering a Graph is CPU bound so it is handed
+off to a pool of worker processes and the event loop is left free to
+accept connections. Decoding, checking and hashing a request body also
+takes a while for large bodies, so that is done on a thread.
+
+Identical requests that arrive while a render is already in flight are
+coalesced: they wait on the same future and only one render happens.
+
+######################
+# Endpoints
+######################
+
+POST /render   Body is a JSON object like:
+
+               {
+                 "amp_range": [75, 105],
+                 "freq_range": [20, 22000],
+                 "traces": [{"name": "Shure SM-57",
+                             "points": [[20.0, 80.1], [21.2, 80.3], ...]}]
+               }
+
+               Any Graph keyword argument (total_size, graph_size,
+               graph_offset, freq_range, amp_range, interpolation,
+               label_font) may be passed.
+               Answers 200 with an image/svg+xml body, or 400 when the
+               description is malformed.
+
+GET /metrics   Answers with a JSON object of counters, the number of
+               renders in flight and latency percentiles in milliseconds.
+
+######################
+# Backpressure
+######################
+
+Bodies larger than max_body bytes are refused with 413. When max_pending
+distinct renders are already queued or running, new (non coalesced)
+requests are refused with 503 so clients can back off instead of piling
+up behind the pool.
+'''
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from numbers import Real
+
+from utils.graph import Font, interpolation_methods
+
+
+# Graph keyword arguments a request is allowed to set
+graph_options = ('total_size', 'graph_size', 'graph_offset', 'freq_range', 'amp_range',
+                 'interpolation', 'label_font')
+
+# Graph keyword arguments that are (x, y) pairs or (a, b) ranges
+pair_options = ('total_size', 'graph_size', 'graph_offset', 'freq_range', 'amp_range')
+
+reasons = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+def render_svg(request):
+    '''
+    Render a plot description to an SVG string. This runs inside a worker
+    process so it imports the graph module itself and only receives plain
+    data that pickles cheaply.
+    '''
+    from utils.graph import Graph
+
+    options = {}
+    for key in graph_options:
+        if key in request:
+            value = request[key]
+            options[key] = tuple(value) if isinstance(value, list) else value
+    g = Graph(**options)
+
+    for trace in request.get('traces', []):
+        g.add_trace({
+            'name': trace.get('name', ''),
+            'points': [tuple(pair) for pair in trace['points']]
+        })
+
+    g.render()
+    return g.dwg.tostring()
+
+
+def is_number(value):
+    # bool is a subclass of int but true/false aren't coordinates
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+def is_pair(value):
+    return isinstance(value, list) and len(value) == 2 and all(is_number(v) for v in value)
+
+
+def validate_request(request):
+    '''
+    Check the shape of a plot description before it is sent to a worker.
+    Returns a message describing the first problem found, or None.
+    '''
+    for key in pair_options:
+        if key in request and not is_pair(request[key]):
+            return '%s must be a list of two numbers' % key
+
+    if 'freq_range' in request:
+        low, high = request['freq_range']
+        if not 0 < low < high:
+            return 'freq_range must be increasing and above 0'
+
+    if 'amp_range' in request:
+        low, high = request['amp_range']
+        if low == high:
+            return 'amp_range must not be empty'
+
+    if 'interpolation' in request and request['interpolation'] not in interpolation_methods:
+        return 'interpolation must be one of: %s' % ', '.join(interpolation_methods)
+
+    if 'label_font' in request:
+        font = request['label_font']
+        if not isinstance(font, dict) or not set(font) <= set(Font._fields):
+            return 'label_font may only set: %s' % ', '.join(Font._fields)
+        if not all(isinstance(value, (str, Real)) for value in font.values()):
+            return 'label_font values must be strings or numbers'
+
+    traces = request.get('traces', [])
+    if not isinstance(traces, list):
+        return 'traces must be a list'
+    for trace in traces:
+        if not isinstance(trace, dict) or not isinstance(trace.get('points'), list):
+            return 'every trace must be an object with a points list'
+        if not isinstance(trace.get('name', ''), str):
+            return 'trace names must be strings'
+        if not all(is_pair(pair) for pair in trace['points']):
+            return 'trace points must be [frequency, amplitude] pairs of numbers'
+
+    return None
+
+
+def request_key(request):
+    ''' Hash a request so identical plot descriptions share a key. '''
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def prepare_request(body):
+    '''
+    Decode, check and hash a request body. Large bodies take a while to get
+    through, so the server runs this on a thread to keep the event loop free.
+    Returns a (request, key, problem) tuple, problem being None for a request
+    that can be rendered.
+    '''
+    try:
+        request = json.loads(body.decode('utf-8'))
+    except ValueError:
+        return None, None, 'body is not valid JSON'
+
+    if not isinstance(request, dict):
+        return None, None, 'body must be a JSON object'
+
+    problem = validate_request(request)
+    if problem is not None:
+        return request, None, problem
+
+    return request, request_key(request), None
+
+
+def percentile(samples, fraction):
+    ''' Nearest rank percentile of an already sorted list. '''
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+class RenderServer:
+    def __init__(
+        self,
+        host='127.0.0.1',
+        port=8000,
+        workers=None,
+        max_pending=64,
+        max_body=16 * 1024 * 1024,
+        latency_window=1000
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_body = max_body
+
+        # In flight renders keyed by request hash
+        self.pending = {}
+
+        # Rolling window of request latencies in seconds
+        self.latencies = deque(maxlen=latency_window)
+        self.counters = {
+            'requests': 0,
+            'renders': 0,
+            'coalesced': 0,
+            'rejected': 0,
+            'errors': 0,
+        }
+
+        self.executor = None
+        self.server = None
+
+    def make_executor(self):
+        # Forked workers would inherit open client sockets and keep those
+        # connections alive after the server closes them, so start workers
+        # from a clean process instead.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in methods else 'spawn')
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    def replace_executor(self, broken):
+        '''
+        Swap in a new pool after a worker died. Only the first request to
+        notice a broken pool replaces it.
+        '''
+        if self.executor is broken:
+            broken.shutdown(wait=False)
+            self.executor = self.make_executor()
+
+    ########################################
+    #  Lifecycle
+
+    async def start(self):
+        self.executor = self.make_executor()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        # Pick up the real port when 0 was passed to let the OS choose
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    ########################################
+    #  Rendering
+
+    async def render(self, request, key=None):
+        '''
+        Render a request in the process pool, joining an identical render
+        that is already in flight if there is one. Pass the request_key() of
+        the request if it is already known.
+        '''
+        loop = asyncio.get_running_loop()
+        if key is None:
+            key = await loop.run_in_executor(None, request_key, request)
+
+        if key in self.pending:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(self.pending[key])
+
+        if len(self.pending) >= self.max_pending:
+            self.counters['rejected'] += 1
+            raise OverflowError('render queue is full')
+
+        executor = self.executor
+        try:
+            future = loop.run_in_executor(executor, render_svg, request)
+        except BrokenProcessPool:
+            # The pool broke before this request was sent to it
+            self.replace_executor(executor)
+            executor = self.executor
+            future = loop.run_in_executor(executor, render_svg, request)
+
+        self.pending[key] = future
+        self.counters['renders'] += 1
+        try:
+            return await asyncio.shield(future)
+        except BrokenProcessPool:
+            # Requests that were in flight when a worker died fail, the
+            # ones after them go to a new pool
+            self.replace_executor(executor)
+            raise
+        finally:
+            self.pending.pop(key, None)
+
+    def metrics(self):
+        samples = sorted(self.latencies)
+        result = dict(self.counters)
+        result['in_flight'] = len(self.pending)
+        result['max_pending'] = self.max_pending
+        result['latency_ms'] = {
+            'count': len(samples),
+            'mean': sum(samples) / len(samples) * 1000 if samples else 0.0,
+            'p50': percentile(samples, .50) * 1000,
+            'p95': percentile(samples, .95) * 1000,
+            'p99': percentile(samples, .99) * 1000,
+        }
+        return result
+
+    ########################################
+    #  HTTP Handling
+
+    async def handle(self, reader, writer):
+        start = time.perf_counter()
+        try:
+            status, content_type, body = await self.respond(reader)
+        except Exception as error:
+            self.counters['errors'] += 1
+            status, content_type, body = 500, 'text/plain', str(error).encode('utf-8')
+
+        head = 'HTTP/1.1 %d %s\r\n' % (status, reasons[status])
+        head += 'Content-Type: %s\r\n' % content_type
+        head += 'Content-Length: %d\r\n' % len(body)
+        head += 'Connection: close\r\n\r\n'
+
+        try:
+            writer.write(head.encode('latin-1') + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+        self.latencies.append(time.perf_counter() - start)
+
+    async def respond(self, reader):
+        '''
+        Read one HTTP request and return a (status, content type, body) tuple.
+        '''
+        request_line = await reader.readline()
+        try:
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            return 400, 'text/plain', b'malformed request line'
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        self.counters['requests'] += 1
+
+        if path == '/metrics':
+            return 200, 'application/json', json.dumps(self.metrics()).encode('utf-8')
+
+        if path != '/render':
+            return 404, 'text/plain', b'not found'
+
+        if method != 'POST':
+            return 405, 'text/plain', b'use POST'
+
+        length = int(headers.get('content-length', 0))
+        if length > self.max_body:
+            self.counters['rejected'] += 1
+            return 413, 'text/plain', b'request body too large'
+
+        try:
+            body = await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return 400, 'text/plain', b'body is not valid JSON'
+
+        loop = asyncio.get_running_loop()
+        request, key, problem = await loop.run_in_executor(None, prepare_request, body)
+        if problem is not None:
+            return 400, 'text/plain', problem.encode('utf-8')
+
+        try:
+            svg = await self.render(request, key)
+        except OverflowError:
+            return 503, 'text/plain', b'render queue is full, retry later'
+
+        return 200, 'image/svg+xml', svg.encode('utf-8')
+
+
+############################################################
+#
+#    Test Client
+
+
+async def fetch(host, port, method, path, payload=None):
+    '''
+    Send a single request to the render server and return (status, body).
+    '''
+    body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+
+    reader, writer = await asyncio.open_connection(host, port)
+    head = '%s %s HTTP/1.1\r\n' % (method, path)
+    head += 'Host: %s\r\n' % host
+    head += 'Content-Type: application/json\r\n'
+    head += 'Content-Length: %d\r\n\r\n' % len(body)
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    return status, body
+
+
+async def benchmark(host, port, payloads, concurrency=16):
+    '''
+    Post every payload to /render with at most `concurrency` requests open
+    at once. Returns a list of (status, seconds) tuples, one per payload.
+    '''
+    limit = asyncio.Semaphore(concurrency)
+
+    async def timed(payload):
+        async with limit:
+            start = time.perf_counter()
+            status, _ = await fetch(host, port, 'POST', '/render', payload)
+            return status, time.perf_counter() - start
+
+    return await asyncio.gather(*[timed(payload) for payload in payloads])
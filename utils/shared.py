@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+# coding=utf-8
+#
+# Author:  Jared Ellison
+# Site:  jaredellison.net
+# Purpose: Share parsed measurements with worker processes without copying
+# Created: 10.19.2026
+
+'''
+######################
+# Overview
+######################
+
+Handing traces to a multiprocessing pool pickles every point list for
+every worker, so each worker pays to deserialize the data and holds its
+own copy. A SharedStore packs the frequency, spl and phase columns of
+many measurements into one block of shared memory. Workers are passed a
+small handle, attach to the block and read the columns as numpy views.
+
+    with SharedStore.create(measurements) as store:
+        pool.map(work, [(store.handle, name) for name in store.names()])
+
+    def work(args):
+        handle, name = args
+        trace = SharedStore.attach(handle).trace(name)
+
+The block starts with a small header: a uint64 byte length followed by a
+utf-8 JSON index of [name, n, byte offset] entries, padded to 8 bytes.
+After it the columns are laid out the same way as in archive.py: for each
+measurement the frequency[n], spl[n] and phase[n] float64 columns back to
+back, with offsets counted from the end of the header. The handle is only
+the name of the block, so it pickles to the same few bytes however many
+measurements the store holds, and a worker reads the index from shared
+memory once when it first attaches.
+
+The process that creates a store owns it and unlinks the shared memory
+when the store is closed, so workers should be started and finished
+while the owner keeps it open. Reading columns works as it does for an
+archive, see utils.archive.ColumnStore.
+'''
+
+import json
+import struct
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.archive import ColumnStore, column_names
+
+
+StoreHandle = namedtuple('StoreHandle', ['shm_name'])
+
+# byte length of the JSON index at the start of a block
+index_length = struct.Struct('<Q')
+
+# Stores attached in this process by shared memory name, so a worker only
+# attaches once however many tasks it is given
+attached = {}
+
+
+def open_shared_memory(name):
+    try:
+        # Python 3.13+, leave cleanup to the owner
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedStore(ColumnStore):
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+
+        length = index_length.unpack_from(shm.buf)[0]
+        start = index_length.size
+        self.index = json.loads(bytes(shm.buf[start:start + length]).decode('utf-8'))
+
+        # Columns start after the header, padded to 8 bytes
+        self.index_columns(shm.buf, -(-(start + length) // 8) * 8,
+                           [entry[0] for entry in self.index],
+                           [entry[1] for entry in self.index],
+                           [entry[2] for entry in self.index])
+
+    @classmethod
+    def create(cls, measurements):
+        '''
+        Copy a collection of measurement dictionaries, as produced by
+        utils.extract.iter_measurements, into a new block of shared memory.
+        '''
+        measurements = list(measurements)
+
+        index = []
+        offset = 0
+        for measurement in measurements:
+            count = len(measurement['points'])
+            index.append([measurement['name'], count, offset])
+            offset += 8 * count * len(column_names)
+
+        index_bytes = json.dumps(index, separators=(',', ':')).encode('utf-8')
+        header_size = -(-(index_length.size + len(index_bytes)) // 8) * 8
+
+        shm = shared_memory.SharedMemory(create=True, size=header_size + offset)
+        index_length.pack_into(shm.buf, 0, len(index_bytes))
+        shm.buf[index_length.size:index_length.size + len(index_bytes)] = index_bytes
+        store = cls(shm, owner=True)
+
+        for position, measurement in enumerate(measurements):
+            freq, spl, phase = store.columns_at(position)
+            points = np.asarray(measurement['points'], dtype=float).reshape(-1, 2)
+            freq[:] = points[:, 0]
+            spl[:] = points[:, 1]
+            measured_phase = measurement.get('phase')
+            if measured_phase is None or len(measured_phase) != len(phase):
+                phase[:] = np.nan
+            else:
+                phase[:] = measured_phase
+            del freq, spl, phase
+
+        return store
+
+    @classmethod
+    def attach(cls, handle):
+        '''
+        Attach to a store created in another process from its handle.
+        '''
+        if handle.shm_name not in attached:
+            shm = open_shared_memory(handle.shm_name)
+            attached[handle.shm_name] = cls(shm)
+        return attached[handle.shm_name]
+
+    @property
+    def handle(self):
+        return StoreHandle(self.shm.name)
+
+    def close(self):
+        '''
+        Detach from the shared memory, the owner also unlinks it. As with
+        ColumnStore.close() the mapping stays until the last array from
+        columns() or trace() is garbage collected.
+        '''
+        attached.pop(self.shm.name, None)
+        super().close()
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+
+    def release(self):
+        self.shm.close()